@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+import functools
+import html
 import streamlit as st
 import streamlit.components.v1 as components
+from collections.abc import Iterator
 from datetime import date, timedelta
-from dateutil.relativedelta import relativedelta
+from itertools import combinations
 
 st.set_page_config(
     page_title="🧰 Tools: Passport + Compliance",
@@ -10,16 +13,28 @@ st.set_page_config(
     layout="centered",
 )
 
+# st.fragment появился в Streamlit 1.37; на старых версиях вкладки просто
+# перезапускаются целиком.
+fragment = getattr(st, "fragment", lambda f: f)
+
 # =========================================================
 # 1) PASSPORT TOOL
 # =========================================================
 
 MIN_BIRTH = date(1900, 1, 1)
-MAX_BIRTH = date.today()
 MIN_ISSUE = date(1900, 1, 1)
-MAX_ISSUE = date.today()
 
 
+def _fmt_date(d: date) -> str:
+    """Дата в формате ДД.ММ.ГГГГ (без strftime)."""
+    return f"{d.day:02d}.{d.month:02d}.{d.year}"
+
+
+_MIN_BIRTH_STR = _fmt_date(MIN_BIRTH)
+_MIN_ISSUE_STR = _fmt_date(MIN_ISSUE)
+
+
+@functools.lru_cache(maxsize=1024)
 def safe_add_years(d: date, years: int) -> date:
     """Добавить годы к дате, корректно обрабатывая 29 февраля."""
     try:
@@ -28,14 +43,28 @@ def safe_add_years(d: date, years: int) -> date:
         return d.replace(month=2, day=28, year=d.year + years)
 
 
-def current_passport_stage(birth: date, issue: date) -> int | None:
+def _age_years(today: date, birth: date) -> int:
+    """Количество полных лет на дату today (29 февраля → 28 февраля, как в safe_add_years)."""
+    n = today.year - birth.year
+    return n - (today < safe_add_years(birth, n))
+
+
+def age_thresholds(birth: date) -> tuple[date, date, date]:
+    """Даты достижения 14, 20 и 45 лет."""
+    return safe_add_years(birth, 14), safe_add_years(birth, 20), safe_add_years(birth, 45)
+
+
+def current_passport_stage(
+    birth: date,
+    issue: date,
+    thresholds: tuple[date, date, date] | None = None,
+) -> int | None:
     """
     Определить этап текущего паспорта по дате выдачи (по интервалам возрастных порогов):
     возвращает 14, 20, 45 или None (если ввод странный).
+    thresholds — заранее посчитанные (d14, d20, d45), чтобы не считать их повторно.
     """
-    d14 = safe_add_years(birth, 14)
-    d20 = safe_add_years(birth, 20)
-    d45 = safe_add_years(birth, 45)
+    d14, d20, d45 = thresholds or age_thresholds(birth)
 
     if issue >= d45:
         return 45
@@ -63,10 +92,10 @@ def compute_status(birth: date, issue: date, today: date) -> dict:
       status_kind: 'invalid' | 'due' | 'ok' | 'no_more',
       days_left (если применимо).
     """
-    d20 = safe_add_years(birth, 20)
-    d45 = safe_add_years(birth, 45)
+    thresholds = age_thresholds(birth)
+    _, d20, d45 = thresholds
 
-    stage = current_passport_stage(birth, issue)
+    stage = current_passport_stage(birth, issue, thresholds)
     stage_label = classify_passport_stage_text(stage)
 
     # Следующая возрастная замена по текущему возрасту (устойчивый фолбэк)
@@ -124,37 +153,38 @@ def compute_status(birth: date, issue: date, today: date) -> dict:
     }
 
 
-def validate_inputs(birth: date, issue: date, today: date) -> list[str]:
-    errs: list[str] = []
-
+def validate_inputs(birth: date, issue: date, today: date) -> Iterator[str]:
+    """
+    Выдаёт сообщения об ошибках ввода. Если даты противоречат друг другу,
+    остальные (более дорогие) проверки пропускаются.
+    """
+    fatal = False
     if birth > today:
-        errs.append("Дата рождения не может быть в будущем.")
+        fatal = True
+        yield "Дата рождения не может быть в будущем."
     if issue > today:
-        errs.append("Дата выдачи паспорта не может быть в будущем.")
+        fatal = True
+        yield "Дата выдачи паспорта не может быть в будущем."
     if issue < birth:
-        errs.append("Дата выдачи паспорта не может быть раньше даты рождения.")
+        fatal = True
+        yield "Дата выдачи паспорта не может быть раньше даты рождения."
+    if fatal:
+        return
 
-    if relativedelta(today, birth).years < 14:
-        errs.append("Лицу младше 14 лет паспорт ещё не выдается.")
+    if birth < MIN_BIRTH:
+        yield f"Дата рождения должна быть в диапазоне {_MIN_BIRTH_STR}–{_fmt_date(today)}."
+    if issue < MIN_ISSUE:
+        yield f"Дата выдачи должна быть в диапазоне {_MIN_ISSUE_STR}–{_fmt_date(today)}."
+
+    if _age_years(today, birth) < 14:
+        yield "Лицу младше 14 лет паспорт ещё не выдается."
 
     d14 = safe_add_years(birth, 14)
     if issue < d14:
-        errs.append("Паспорт не может быть выдан ранее достижения 14 лет. Проверьте дату выдачи.")
-
-    if not (MIN_BIRTH <= birth <= MAX_BIRTH):
-        errs.append(
-            f"Дата рождения должна быть в диапазоне "
-            f"{MIN_BIRTH.strftime('%d.%m.%Y')}–{MAX_BIRTH.strftime('%d.%m.%Y')}."
-        )
-    if not (MIN_ISSUE <= issue <= MAX_ISSUE):
-        errs.append(
-            f"Дата выдачи должна быть в диапазоне "
-            f"{MIN_ISSUE.strftime('%d.%m.%Y')}–{MAX_ISSUE.strftime('%d.%m.%Y')}."
-        )
-
-    return errs
+        yield "Паспорт не может быть выдан ранее достижения 14 лет. Проверьте дату выдачи."
 
 
+@fragment
 def passport_app():
     st.title("🛂 Калькулятор замены паспорта РФ")
     st.caption("Рассчитывает даты обязательной замены по порогам 20 и 45 лет и 90-дневному сроку после дня рождения.")
@@ -173,8 +203,8 @@ def passport_app():
             "Дата рождения",
             value=date(1990, 1, 1),
             min_value=MIN_BIRTH,
-            max_value=MAX_BIRTH,
-            format="DD.MM.YYYY",  # если старая версия Streamlit — удалите этот параметр
+            max_value=today,
+            format="DD.MM.YYYY",  # если ваша версия Streamlit не знает параметр format — удалите его
             key="passport_birth_v1",
         )
     with col2:
@@ -182,18 +212,19 @@ def passport_app():
             "Дата выдачи текущего паспорта",
             value=date(2010, 1, 1),
             min_value=MIN_ISSUE,
-            max_value=MAX_ISSUE,
+            max_value=today,
             format="DD.MM.YYYY",
             key="passport_issue_v1",
         )
 
     if st.button("Рассчитать", key="passport_calc_btn"):
-        errors = validate_inputs(birth, issue, today)
-        for e in errors:
+        has_errors = False
+        for e in validate_inputs(birth, issue, today):
             st.error(e)
+            has_errors = True
 
-        if not errors:
-            age_years = relativedelta(today, birth).years
+        if not has_errors:
+            age_years = _age_years(today, birth)
             st.subheader("Результаты")
             st.write(f"Возраст (полных лет): {age_years}")
 
@@ -201,8 +232,8 @@ def passport_app():
             st.write(f"Текущий документ получен как: {res['stage_label']}")
 
             if res["next_change"]:
-                st.write(f"Дата обязательной замены: {res['next_change'].strftime('%d.%m.%Y')}")
-                st.write(f"Крайний срок (90 дней после ДР): {res['deadline'].strftime('%d.%m.%Y')}")
+                st.write(f"Дата обязательной замены: {_fmt_date(res['next_change'])}")
+                st.write(f"Крайний срок (90 дней после ДР): {_fmt_date(res['deadline'])}")
 
             if res["status_kind"] == "invalid":
                 st.error("Паспорт недействителен. Требуется замена.")
@@ -286,10 +317,11 @@ blocks = {
 }
 
 PRIORITY = ["SOF", "ID", "UB"]
+_RANK = {k: i for i, k in enumerate(PRIORITY)}
 
 
 def sort_by_priority(keys):
-    return [k for k in PRIORITY if k in keys]
+    return sorted(keys, key=_RANK.__getitem__)
 
 
 def render_middle_adaptive(lang: str, reqs: list) -> str:
@@ -307,22 +339,57 @@ def render_middle_adaptive(lang: str, reqs: list) -> str:
     return "\n\n".join(parts)
 
 
-def js_escape(s: str) -> str:
-    return (
-        s.replace("\\", "\\\\")
-         .replace("`", "\\`")
-         .replace("${", "\\${")
-         .replace("\r", "")
-         .replace("\n", "\\n")
-    )
+# Вступление и концовка не меняются — склеиваем их в шаблон с местом под middle.
+SHELLS = {
+    lang: f"{intro_texts[lang]}\n\n{{middle}}\n\n{closing_texts[lang]}".strip()
+    for lang in intro_texts
+}
+
+
+def build_full_text(lang: str, parts: tuple[str, ...]) -> str:
+    middle_text = render_middle_adaptive(lang, list(parts))
+    return SHELLS[lang].replace("{middle}", middle_text)
+
+
+# Все варианты текста (язык × непустое подмножество блоков в порядке PRIORITY)
+# известны заранее — собираем их один раз при загрузке модуля.
+PRECOMPUTED: dict[tuple[str, tuple[str, ...]], str] = {
+    (lang, combo): build_full_text(lang, combo)
+    for lang in intro_texts
+    for n in range(1, len(PRIORITY) + 1)
+    for combo in combinations(PRIORITY, n)
+}
+
+
+# Разметка кнопки копирования не меняется; от рендера к рендеру меняется только
+# значение data-text (экранируется как HTML-атрибут).
+_COPY_HTML_TEMPLATE = """
+            <button id="copyButton" data-text="{payload}">Copy text</button>
+            <script>
+                const btn = document.getElementById('copyButton');
+                btn.addEventListener('click', function() {
+                    navigator.clipboard.writeText(btn.dataset.text).then(function() {
+                        alert('Text copied to clipboard!');
+                    }).catch(function(err) {
+                        alert('Error copying text!');
+                    });
+                });
+            </script>
+            """
+
+
+@functools.lru_cache(maxsize=32)
+def copy_button_html(text: str) -> str:
+    return _COPY_HTML_TEMPLATE.replace("{payload}", html.escape(text, quote=True))
 
 
+@fragment
 def compliance_app():
     st.title("Compliance request template")
 
     selected_parts = st.multiselect(
         "Choose your request:",
-        options=["SOF", "ID", "UB"],
+        options=PRIORITY,
         default=["SOF"],
         key="cmp_selected_parts",
     )
@@ -339,25 +406,12 @@ def compliance_app():
             st.text_area("Result:", placeholder_text, height=320, key="cmp_result_empty")
             return
 
-        middle_text = render_middle_adaptive(language, selected_parts)
-        text = f"{intro_texts[language]}\n\n{middle_text}\n\n{closing_texts[language]}".strip()
+        text = PRECOMPUTED[(language, tuple(sort_by_priority(selected_parts)))]
 
         st.text_area("Result:", text, height=320, key="cmp_result")
 
         components.html(
-            f"""
-            <button id="copyButton">Copy text</button>
-            <script>
-                document.getElementById('copyButton').addEventListener('click', function() {{
-                    const text = `{js_escape(text)}`;
-                    navigator.clipboard.writeText(text).then(function() {{
-                        alert('Text copied to clipboard!');
-                    }}).catch(function(err) {{
-                        alert('Error copying text!');
-                    }});
-                }});
-            </script>
-            """,
+            copy_button_html(text),
             height=100
         )
 